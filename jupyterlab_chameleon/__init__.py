@@ -1,3 +1,4 @@
+import functools
 import json
 import os
 from pathlib import Path
@@ -5,29 +6,39 @@ from typing import TYPE_CHECKING
 
 from jupyter_server.utils import url_path_join
 
-from .artifact import ArtifactLinkHandler, ArtifactMetadataHandler, store_trovi_artifact_data
-from .db import LocalArtifact, DB
+from .artifact import (
+    ArtifactLinkHandler,
+    ArtifactMetadataHandler,
+    ArtifactMetricHandler,
+    store_trovi_artifact_data,
+)
+from .db import LocalArtifact, DB, LazyDB
 from .heartbeat import HeartbeatHandler
 from ._version import __version__
-from jupyterlab_chameleon.artifact import ArtifactMetricHandler
 
 if TYPE_CHECKING:
     from notebook.notebookapp import NotebookApp
 
 HERE = Path(__file__).parent.resolve()
 
-with (HERE / "labextension" / "package.json").open() as fid:
-    data = json.load(fid)
+
+@functools.lru_cache(maxsize=1)
+def _labextension_package():
+    return json.loads((HERE / "labextension" / "package.json").read_text())
 
 
 def _jupyter_labextension_paths():
-    return [{"src": "labextension", "dest": data["name"]}]
+    return [{"src": "labextension", "dest": _labextension_package()["name"]}]
 
 
 def _jupyter_server_extension_points():
     return [{"module": "jupyterlab_chameleon"}]
 
 
+# For older notebook servers; both resolve to the same single entry point.
+_jupyter_server_extension_paths = _jupyter_server_extension_points
+
+
 def _load_jupyter_server_extension(server_app: "NotebookApp"):
     """Called when the extension is loaded.
 
@@ -45,7 +56,14 @@ def _load_jupyter_server_extension(server_app: "NotebookApp"):
     metric_endpoint = url_path_join(base_endpoint, "metrics")
     link_endpoint = url_path_join(base_endpoint, "link")
 
-    db = DB(database=f"{notebook_dir}/.chameleon/chameleon.db")
+    def open_db():
+        db = DB(database=f"{notebook_dir}/.chameleon/chameleon.db")
+        init_db(server_app, db)
+        return db
+
+    # Opening the database (and seeding it) is deferred to the first request
+    # that needs it, so it does not delay server startup.
+    db = LazyDB(open_db)
 
     handlers = [
         (heartbeat_endpoint, HeartbeatHandler),
@@ -67,7 +85,6 @@ def _load_jupyter_server_extension(server_app: "NotebookApp"):
     ]
     web_app.add_handlers(".*$", handlers)
 
-    init_db(server_app, db)
     server_app.log.info("Registered Chameleon extension at URL path /chameleon")
 
 
@@ -1,19 +1,31 @@
-import pathlib
-import shutil
-
+import contextlib
+import fnmatch
+import functools
+import gzip
+import io
 import json
 import logging
 import os
 import re
-import string
-import requests
+import shutil
+import stat
+import subprocess
+import tarfile
 import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from typing import BinaryIO, Callable, Iterable, Iterator, Union
+from urllib.parse import urljoin
 
 from jupyter_server.base.handlers import APIHandler
 from keystoneauth1.exceptions.http import Unauthorized
 from requests import HTTPError
-from tornado import web
-from traitlets import Any, Tuple
+from tornado import gen, web
+from tornado.ioloop import IOLoop
+from traitlets import Any, Bool, Enum, Float, Int, Tuple, Unicode
 from traitlets.config import LoggingConfigurable
 
 from .db import DB
@@ -25,13 +37,101 @@ from .exception import (
 from .trovi import (
     contents_url,
     get_trovi_token,
+    refresh_trovi_url,
     artifacts_url,
     artifact_versions_url,
 )
-from .util import ErrorResponder, call_jupyterhub_api
+from .util import (
+    ErrorResponder,
+    call_jupyterhub_api,
+    http_session,
+    json_dumps,
+    json_loads,
+)
 
 LOG = logging.getLogger(__name__)
 
+# Read size used when streaming an archive to the storage tier.
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Archives up to this size are built in memory rather than in a temp file.
+ARCHIVE_SPOOL_SIZE = 64 * 1024 * 1024
+# Buffer size used when copying file contents into an archive, and for
+# coalescing tarfile's small writes before they reach the compressor.
+ARCHIVE_COPY_BUFSIZE = 2 * 1024 * 1024
+# Trees with at least this many small files have those files read ahead on a
+# thread pool while the in-process archive is written.
+ARCHIVE_READ_AHEAD_MIN_FILES = 500
+# Largest file that is read ahead, and how many files may be read ahead at once.
+ARCHIVE_READ_AHEAD_SIZE = 1024 * 1024
+ARCHIVE_READ_AHEAD_DEPTH = 64
+ARCHIVE_READERS = 8
+
+# Formats that are already compressed; deflating them again costs CPU without
+# making the archive meaningfully smaller.
+INCOMPRESSIBLE_EXTENSIONS = frozenset(
+    {
+        ".7z",
+        ".bin",
+        ".bz2",
+        ".gif",
+        ".gz",
+        ".jpeg",
+        ".jpg",
+        ".lz4",
+        ".mp3",
+        ".mp4",
+        ".npz",
+        ".onnx",
+        ".parquet",
+        ".png",
+        ".pt",
+        ".tgz",
+        ".webp",
+        ".xz",
+        ".zip",
+        ".zst",
+    }
+)
+# Above this fraction of already-compressed bytes, the archive is stored
+# without compression.
+INCOMPRESSIBLE_THRESHOLD = 0.9
+
+GLOB_CHARS = re.compile(r"[*?[]")
+
+# Threads used to read .trovi.json files found in the workspace.
+TROVI_CONFIG_READERS = 8
+
+# Parsed .trovi.json files by path, with the (mtime, size) they were read at.
+_trovi_configs = {}
+
+# (list url, monotonic time fetched, serialized artifacts) of the last listing.
+_cached_listing = None
+
+# Per-compression file extension and MIME type of the archive.
+ARCHIVE_FORMATS = {
+    "gzip": (".tar.gz", "application/tar+gz"),
+    "zstd": (".tar.zst", "application/tar+zstd"),
+}
+# zstd stores incompressible blocks as-is, so one level suits every tree.
+ZSTD_LEVEL = 3
+
+# Links with this prefix carry the ID of a legacy artifact version.
+LEGACY_ID_LINK_PREFIX = "urn:trovi:artifact:chameleon:legacy:"
+
+# Artifact fields passed through as-is when creating an artifact, if set.
+CREATE_FIELDS = (
+    "title",
+    "short_description",
+    "long_description",
+    "tags",
+    "authors",
+    "reproducibility",
+    "owner_urn",
+    "visibility",
+)
+# Front-end version fields and their names in a version request.
+VERSION_FIELDS = (("newContents", "contents"), ("newLinks", "links"))
+
 
 def default_prepare_upload():
     """Prepare an upload to the external storage tier.
@@ -137,70 +237,521 @@ def default_prepare_list():
     return response
 
 
+class ArchiveBody:
+    """Request body that streams an archive in ``UPLOAD_CHUNK_SIZE`` pieces.
+
+    Reporting the length up front lets requests send a Content-Length header
+    instead of switching to chunked transfer encoding.
+    """
+
+    def __init__(self, fileobj: "BinaryIO", size: int):
+        self.fileobj = fileobj
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        readinto = getattr(self.fileobj, "readinto", None)
+        if readinto is None:
+            # SpooledTemporaryFile only gained readinto() in Python 3.11.
+            while chunk := self.fileobj.read(UPLOAD_CHUNK_SIZE):
+                yield chunk
+            return
+        # Each chunk is written to the socket before the next one is read, so
+        # a single buffer can be reused instead of allocating one per chunk.
+        buf = bytearray(UPLOAD_CHUNK_SIZE)
+        view = memoryview(buf)
+        while n := readinto(buf):
+            yield view[:n]
+
+
+@functools.lru_cache(maxsize=1)
+def _has_gnu_tar() -> bool:
+    """Whether the ``tar`` on the PATH is GNU tar.
+
+    The external archiving path relies on GNU tar options (e.g. --null and
+    --transform) and on its exit status for files that changed while being
+    read; other tars (bsdtar, busybox) use the in-process path instead.
+    """
+    if not shutil.which("tar"):
+        return False
+    try:
+        res = subprocess.run(["tar", "--version"], capture_output=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return res.returncode == 0 and b"GNU tar" in res.stdout
+
+
 class ArtifactArchiver(LoggingConfigurable):
     ignored_file_pattern = Tuple(
         config=True,
-        default_value=(".chameleon", ".ipynb_checkpoints", ".git", ".ssh", ".trovi.json"),
+        default_value=(
+            ".chameleon",
+            ".ipynb_checkpoints",
+            ".git",
+            ".ssh",
+            ".trovi.json",
+            # Left behind if writing .trovi.json is interrupted.
+            ".trovi.json.*.tmp",
+        ),
         help=(
             "A tuple of glob patterns of files/directories to ignore when packaging"
             "the archive."
         ),
     )
 
-    def package(self, path: str) -> str:
-        """Create gzipped tar file filename from directory
+    compression = Enum(
+        tuple(ARCHIVE_FORMATS),
+        config=True,
+        default_value="gzip",
+        help=(
+            "Compression used for artifact archives. zstd is several times "
+            "faster than gzip at a similar ratio, but requires the zstd tool or "
+            "the zstandard package, and a storage tier that accepts .tar.zst "
+            "archives."
+        ),
+    )
+
+    use_external_tools = Bool(
+        config=True,
+        default_value=True,
+        help=(
+            "Whether to build archives with the external tar and pigz (or zstd) "
+            "tools when they are installed. Both compressors use all cores; "
+            "otherwise the archive is built in-process with tarfile."
+        ),
+    )
+
+    gzip_level = Int(
+        config=True,
+        default_value=6,
+        help=(
+            "The gzip compression level (1-9) of artifact archives. Trees made "
+            "up almost entirely of already-compressed files are stored "
+            "uncompressed regardless."
+        ),
+    )
+
+    archive_dir = Unicode(
+        config=True,
+        default_value="",
+        help=(
+            "The directory where archives too large to build in memory are "
+            "written while they are uploaded. Defaults to the system temporary "
+            "directory; pointing this at a disk-backed filesystem avoids "
+            "filling a RAM-backed /tmp."
+        ),
+    )
+
+    reproducible = Bool(
+        config=True,
+        default_value=False,
+        help=(
+            "Whether to zero member timestamps and owners, and the gzip header "
+            "timestamp, so that archiving an unchanged directory again gives a "
+            "byte-identical archive. Members are always stored in sorted order."
+        ),
+    )
+
+    max_archive_size = Int(
+        config=True,
+        default_value=0,
+        help=(
+            "The maximum total size, in bytes, of the files packaged into an "
+            "artifact archive. Larger directories are rejected before anything "
+            "is compressed. 0 means no limit."
+        ),
+    )
+
+    @property
+    def extension(self) -> str:
+        """The file extension of archives built by this archiver."""
+        return ARCHIVE_FORMATS[self.compression][0]
+
+    @property
+    def mime_type(self) -> str:
+        """The MIME type of archives built by this archiver."""
+        return ARCHIVE_FORMATS[self.compression][1]
+
+    def package(self, path: str) -> "BinaryIO":
+        """Create a compressed tarball of a directory
 
         Args:
-            path (str): absolute path to directory to be zipped.
-            config (PackageArtifactConfig): the configuration
+            path (str): absolute path to directory to be archived.
 
         Returns:
-            str: absolute path to temporary archive file.
+            BinaryIO: a temporary file holding the archive, positioned at its
+                start. Archives up to ``ARCHIVE_SPOOL_SIZE`` are kept in memory;
+                larger ones spill to disk. Closing the file discards the archive.
 
         Raises:
             ValueError: if the input path is not a directory
-            ValueError: if the total size of all files in the directory exceeds
-                a maximum threshold
+            IllegalArchiveError: if the total size of all files in the
+                directory exceeds ``max_archive_size``
             PermissionError: on file permission errors encountered
             FileNotFoundError: if the input path does not exist
         """
+        entries = self._entries(path)
+        archive = tempfile.SpooledTemporaryFile(
+            max_size=ARCHIVE_SPOOL_SIZE,
+            suffix=self.extension,
+            dir=self.archive_dir or None,
+        )
+        self.write_archive(path, archive, entries)
+
+        size_mb = archive.tell() / 1024 / 1024
+        archive.seek(0)
+        self.log.info(f"Exported archive of {path} (total {size_mb:.2f}MB)")
+
+        return archive
+
+    def stream(self, path: str) -> "Iterator[bytes]":
+        """Build a compressed tarball of a directory, yielding it as it is written.
+
+        The archive is produced by a background thread into a pipe, so it can
+        be uploaded while it is still being compressed and never has to be
+        stored in full.
+
+        Args:
+            path (str): absolute path to directory to be archived.
+
+        Returns:
+            Iterator[bytes]: chunks of the archive, of at most
+                ``UPLOAD_CHUNK_SIZE`` bytes. Any error raised while archiving
+                is re-raised once the stream is exhausted.
+
+        Raises:
+            ValueError: if the input path is not a directory
+            IllegalArchiveError: if the total size of all files in the
+                directory exceeds ``max_archive_size``
+        """
+        entries = self._entries(path)
+        errors = []
+
+        def produce(write_fd):
+            try:
+                with open(write_fd, "wb", buffering=UPLOAD_CHUNK_SIZE) as out:
+                    self.write_archive(path, out, entries)
+            except BaseException as err:
+                errors.append(err)
+
+        def consume():
+            # The pipe is only opened once the stream is read, so nothing is
+            # leaked if the upload fails before it gets that far.
+            read_fd, write_fd = os.pipe()
+            producer = threading.Thread(target=produce, args=(write_fd,), daemon=True)
+            producer.start()
+            with open(read_fd, "rb") as f:
+                while chunk := f.read(UPLOAD_CHUNK_SIZE):
+                    yield chunk
+            producer.join()
+            if errors:
+                raise errors[0]
+
+        return consume()
+
+    def write_archive(
+        self,
+        path: str,
+        fileobj: "BinaryIO",
+        entries: "list[tuple[str, str, os.stat_result]]" = None,
+    ):
+        """Write a compressed tarball of a directory to a binary file object.
+
+        Archive member names are rooted at the directory's base name.
+
+        Args:
+            path (str): absolute path to directory to be archived.
+            fileobj (BinaryIO): where to write the archive.
+            entries (list): the directory's entries, as returned by
+                ``_entries``. Walked here if not given.
+        """
+        path = os.path.normpath(path)
+        if entries is None:
+            entries = self._entries(path)
+
+        if self.compression == "zstd":
+            if self.use_external_tools and _has_gnu_tar() and shutil.which("zstd"):
+                compressor = ["zstd", f"-{ZSTD_LEVEL}", "-T0", "--stdout"]
+                self._write_with_tar(path, entries, fileobj, compressor)
+                return
+            try:
+                import zstandard
+            except ImportError:
+                raise RuntimeError(
+                    "zstd compression requires the zstd tool or the zstandard package"
+                )
+            cctx = zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=-1)
+            with cctx.stream_writer(fileobj, closefd=False) as out:
+                with tarfile.open(
+                    fileobj=out, mode="w|", copybufsize=ARCHIVE_COPY_BUFSIZE
+                ) as tar:
+                    self._add_entries(tar, entries)
+            return
+
+        compresslevel = self._compresslevel(entries)
+        if self.use_external_tools and _has_gnu_tar() and shutil.which("pigz"):
+            compressor = [
+                "pigz",
+                f"-{compresslevel}",
+                f"--processes={os.cpu_count() or 1}",
+            ]
+            if self.reproducible:
+                compressor.append("--no-time")
+            self._write_with_tar(path, entries, fileobj, compressor)
+            return
+
+        with gzip.GzipFile(
+            filename="",
+            fileobj=fileobj,
+            mode="wb",
+            compresslevel=compresslevel,
+            mtime=0 if self.reproducible else None,
+        ) as gz:
+            # tarfile writes headers and padding in 512 byte blocks; buffer
+            # them so zlib is not called for every block.
+            with io.BufferedWriter(gz, buffer_size=ARCHIVE_COPY_BUFSIZE) as out:
+                with tarfile.open(
+                    fileobj=out, mode="w", copybufsize=ARCHIVE_COPY_BUFSIZE
+                ) as tar:
+                    self._add_entries(tar, entries)
+
+    def _add_entries(self, tar, entries: "Iterable[tuple[str, str, os.stat_result]]"):
+        """Add walked entries to an open in-process tar archive."""
+        for absfile, arcname, st, contents in self._read_ahead(entries):
+            # Build the header from the stat result we already have rather
+            # than letting tar.add() lstat the file again.
+            info = tarfile.TarInfo(arcname)
+            info.mode = stat.S_IMODE(st.st_mode)
+            if not self.reproducible:
+                info.uid = st.st_uid
+                info.gid = st.st_gid
+                # Whole seconds: a fractional mtime makes tarfile write an
+                # extra pax header block for every member.
+                info.mtime = int(st.st_mtime)
+            if stat.S_ISREG(st.st_mode):
+                info.size = st.st_size
+                if contents is not None:
+                    tar.addfile(info, io.BytesIO(contents))
+                    continue
+                with open(absfile, "rb") as f:
+                    tar.addfile(info, f)
+                continue
+            if stat.S_ISDIR(st.st_mode):
+                info.type = tarfile.DIRTYPE
+            elif stat.S_ISLNK(st.st_mode):
+                info.type = tarfile.SYMTYPE
+                info.linkname = os.readlink(absfile)
+            else:
+                self.log.debug(f"Skipping special file {absfile}")
+                continue
+            tar.addfile(info)
+
+    def _read_ahead(
+        self, entries: "Iterable[tuple[str, str, os.stat_result]]"
+    ) -> "Iterator[tuple[str, str, os.stat_result, bytes]]":
+        """Yield entries along with the contents of small files, read ahead.
+
+        tarfile is not thread-safe, so members are still added one at a time;
+        this only overlaps the open() and read() calls, which dominate on trees
+        of many small files kept on network storage. Contents are ``None`` for
+        entries that were not read ahead.
+        """
 
+        def is_small(st):
+            return stat.S_ISREG(st.st_mode) and st.st_size <= ARCHIVE_READ_AHEAD_SIZE
+
+        entries = list(entries)
+        small_files = sum(1 for _, _, st in entries if is_small(st))
+        if small_files < ARCHIVE_READ_AHEAD_MIN_FILES:
+            for entry in entries:
+                yield (*entry, None)
+            return
+
+        with ThreadPoolExecutor(max_workers=ARCHIVE_READERS) as pool:
+            # Bound how far ahead we read, so memory use stays small however
+            # large the tree is.
+            pending = deque()
+            for entry in entries:
+                future = None
+                if is_small(entry[2]):
+                    future = pool.submit(_read_file, entry[0])
+                pending.append((entry, future))
+                if len(pending) >= ARCHIVE_READ_AHEAD_DEPTH:
+                    entry, future = pending.popleft()
+                    yield (*entry, future and future.result())
+            while pending:
+                entry, future = pending.popleft()
+                yield (*entry, future and future.result())
+
+    def _write_with_tar(
+        self,
+        path: str,
+        entries: "list[tuple[str, str, os.stat_result]]",
+        fileobj: "BinaryIO",
+        compressor: "list[str]",
+    ):
+        """Write the archive by piping ``tar`` into an external compressor.
+
+        ``tar`` is handed the already-filtered entry list, so the ignore rules
+        are exactly the same as for the in-process path.
+        """
+        arcnames = [arcname for _, arcname, _ in entries]
+        tar_args = [
+            "tar",
+            "--create",
+            "--file=-",
+            f"--directory={os.path.dirname(path)}",
+            "--no-recursion",
+            "--null",
+            "--files-from=-",
+        ]
+        if os.path.islink(path):
+            # tar stores a symlink given by name as a symlink. Name the root
+            # "<base>/." so it is followed, and drop the suffix in the archive.
+            base = os.path.basename(path)
+            arcnames = [f"{name}/." if name == base else name for name in arcnames]
+            tar_args.append(r"--transform=s,^\([^/]*\)/\.$,\1,SH")
+        if self.reproducible:
+            tar_args += ["--mtime=@0", "--owner=0", "--group=0", "--numeric-owner"]
+
+        with tempfile.TemporaryFile() as names, tempfile.TemporaryFile() as errors:
+            # Archive names are relative to the parent of `path`.
+            names.write(b"\0".join(os.fsencode(name) for name in arcnames))
+            names.seek(0)
+            tar = subprocess.Popen(
+                tar_args,
+                stdin=names,
+                stdout=subprocess.PIPE,
+                stderr=errors,
+            )
+            compress = subprocess.Popen(
+                compressor, stdin=tar.stdout, stdout=subprocess.PIPE
+            )
+            # Let tar get SIGPIPE if the compressor exits early.
+            tar.stdout.close()
+            with compress.stdout:
+                shutil.copyfileobj(compress.stdout, fileobj, UPLOAD_CHUNK_SIZE)
+
+            # GNU tar exits with 1 when files changed while being read, which
+            # is expected if e.g. a notebook autosaves during packaging.
+            if tar.wait() not in (0, 1):
+                errors.seek(0)
+                raise subprocess.CalledProcessError(
+                    tar.returncode, tar.args, stderr=errors.read()
+                )
+            if compress.wait() != 0:
+                raise subprocess.CalledProcessError(compress.returncode, compress.args)
+
+    def _entries(self, path: str) -> "list[tuple[str, str, os.stat_result]]":
+        """List the entries of a directory to be archived, sorted by name, and
+        check them against the size limit.
+
+        This only stats files, so an oversized directory is rejected before
+        any time is spent compressing it.
+        """
         if not os.path.isdir(path):
             raise ValueError("Input path must be a directory")
 
-        read_dir = tempfile.mkdtemp()  # /tmp/r
-        read_base = os.path.basename(path)  # src
-        write_dir = tempfile.mkdtemp()  # /tmp/w
-        write_base = os.path.join(write_dir, read_base)  # /tmp/w/src
-
-        # Copy all the files we want to include in the archive to a temp dir.
-        # We do this to filter out the ignored patterns.
-        # There is no utility to ignore files with shutil.make_archive
-        shutil.copytree(
-            path,
-            os.path.join(read_dir, read_base),
-            ignore=shutil.ignore_patterns(*self.ignored_file_pattern)
-        )
-        # archive /tmp/r/src -> /tmp/w/src.tar.gz
-        archive = shutil.make_archive(
-            write_base, "gztar", root_dir=read_dir, base_dir=read_base
-        )
+        # Sorting makes the member order independent of the filesystem's
+        # directory order. A directory's name is a prefix of its children's,
+        # so it still precedes them.
+        entries = sorted(self._walk(os.path.normpath(path)), key=itemgetter(1))
+        if self.max_archive_size:
+            total_size = sum(
+                st.st_size for _, _, st in entries if stat.S_ISREG(st.st_mode)
+            )
+            if total_size > self.max_archive_size:
+                raise IllegalArchiveError(
+                    f"Archive source is too large ({total_size / 1024 / 1024:.2f}MB, "
+                    f"limit {self.max_archive_size / 1024 / 1024:.2f}MB)"
+                )
+        return entries
+
+    def _ignore_matcher(self) -> "Callable[[str], bool]":
+        """Build a predicate telling whether a file name should be ignored.
 
-        size_mb = os.path.getsize(archive) / 1024 / 1024
-        self.log.info(
-            f"Exported archive of {path} at {archive} (total {size_mb:.2f}MB)"
+        Plain names (all of the default patterns) are matched with a set
+        lookup; patterns containing wildcards are compiled into a single
+        regular expression, so each name is matched once however many there
+        are.
+        """
+        literal = frozenset(
+            p for p in self.ignored_file_pattern if not GLOB_CHARS.search(p)
         )
+        globs = [p for p in self.ignored_file_pattern if GLOB_CHARS.search(p)]
+        if not globs:
+            return literal.__contains__
+        match_glob = re.compile("|".join(fnmatch.translate(p) for p in globs)).match
 
-        # Clear out the workdir copy
-        shutil.rmtree(read_dir)
+        def is_ignored(name):
+            return name in literal or match_glob(name) is not None
 
-        return archive
+        return is_ignored
+
+    def _walk(self, path: str):
+        """Yield ``(path, arcname, stat)`` for each entry to archive under ``path``.
+
+        Archive names are rooted at the directory's base name. Ignored
+        directories are pruned without being descended into. The stat result
+        is the one ``os.scandir`` caches (symlinks are not followed), so each
+        entry is only stat'ed once. The directory itself is followed if it is
+        a symlink, so it is archived as the directory it points to.
+        """
+        is_ignored = self._ignore_matcher()
+        base = os.path.basename(path)
+        # Every path scandir yields starts with `path`, so the archive name is
+        # just the base name plus the remainder of the path.
+        prefix_len = len(path)
+        yield path, base, os.stat(path)
+        pending = [path]
+        while pending:
+            with os.scandir(pending.pop()) as it:
+                for entry in it:
+                    # Ignored directories are never pushed, so nothing
+                    # beneath them is listed.
+                    if is_ignored(entry.name):
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                    yield entry.path, base + entry.path[prefix_len:], st
+                    if stat.S_ISDIR(st.st_mode):
+                        pending.append(entry.path)
+
+    def _compresslevel(self, entries: "Iterable[tuple]") -> int:
+        """Choose the gzip level for the entries to be archived.
+
+        This is ``gzip_level``, except that trees made up almost entirely of
+        already-compressed files are stored (level 0), which keeps the archive
+        a valid gzipped tarball while skipping the deflate work.
+        """
+        total_size = incompressible_size = 0
+        for absfile, _, st in entries:
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            total_size += st.st_size
+            if os.path.splitext(absfile)[1].lower() in INCOMPRESSIBLE_EXTENSIONS:
+                incompressible_size += st.st_size
+        if total_size and incompressible_size / total_size > INCOMPRESSIBLE_THRESHOLD:
+            return 0
+        return self.gzip_level
 
 
 class ArtifactAPIClient(LoggingConfigurable):
     # TODO(jason): change prepare_* to Callable when that trait is in some published
     # trailets release. It is still not being published as part of 4.x[1]
     # [1]: https://github.com/ipython/traitlets/pull/333#issuecomment-639153911
+    stream_uploads = Bool(
+        config=True,
+        default_value=False,
+        help=(
+            "Whether to upload artifact archives while they are being built, "
+            "using chunked transfer encoding, instead of building the whole "
+            "archive before uploading it. The storage endpoint must accept "
+            "uploads without a Content-Length."
+        ),
+    )
+
     prepare_create = Any(
         config=True,
         default_value=default_prepare_create,
@@ -247,6 +798,41 @@ class ArtifactAPIClient(LoggingConfigurable):
         ),
     )
 
+    connect_timeout = Float(
+        config=True,
+        default_value=10.0,
+        help="How long, in seconds, to wait for a connection to the Trovi API.",
+    )
+
+    read_timeout = Float(
+        config=True,
+        default_value=300.0,
+        help=(
+            "How long, in seconds, to wait for the Trovi API to respond before "
+            "giving up on a request."
+        ),
+    )
+
+    upload_read_timeout = Float(
+        config=True,
+        default_value=3600.0,
+        help=(
+            "How long, in seconds, to wait for a response to an archive "
+            "upload. This is longer than ``read_timeout`` because the storage "
+            "tier may only respond once it has stored the whole archive."
+        ),
+    )
+
+    list_cache_ttl = Float(
+        config=True,
+        default_value=30.0,
+        help=(
+            "How long, in seconds, an artifact listing fetched from Trovi is "
+            "reused for. Publishing or editing an artifact from this server "
+            "clears it immediately. 0 disables the cache."
+        ),
+    )
+
     prepare_list = Any(
         config=True,
         default_value=default_prepare_list,
@@ -260,15 +846,25 @@ class ArtifactAPIClient(LoggingConfigurable):
         ),
     )
 
-    def create(self, artifact: dict) -> dict:
+    def prepare_publish(self, artifact: dict) -> dict:
+        """Prepare the request :meth:`create` sends for an artifact.
+
+        This only depends on whether the artifact already exists, so it can be
+        done before the artifact's contents have been uploaded.
+        """
         if artifact_id := artifact.get("uuid"):
-            prepared_req = self.prepare_version(artifact_id)
+            return self.prepare_version(artifact_id)
+        return self.prepare_create()
+
+    def create(self, artifact: dict, prepared_req: dict = None) -> dict:
+        if artifact.get("uuid"):
             body = self._to_version_request(artifact)
             log_message = "Created new artifact version"
         else:
-            prepared_req = self.prepare_create()
             body = self._to_create_request(artifact)
             log_message = "Published new artifact"
+        if prepared_req is None:
+            prepared_req = self.prepare_publish(artifact)
 
         publish_url = prepared_req.get("url")
         publish_method = prepared_req.get("method", "POST")
@@ -279,16 +875,17 @@ class ArtifactAPIClient(LoggingConfigurable):
 
         # We send the artifact on to the API without validation
         # If there's something wrong here, the API should let us know 🤞
-        res = requests.request(
+        res = self._request(
             url=publish_url,
             method=publish_method,
-            headers=publish_headers,
-            json=body,
+            headers={"content-type": "application/json", **publish_headers},
+            data=json_dumps(body),
         )
         res.raise_for_status()
 
-        info = res.json()
-        self.log.info(f"{log_message}: {json.dumps(info, indent=4)}")
+        info = json_loads(res.content)
+        self.log.info("%s: %s", log_message, info)
+        clear_listing_cache()
 
         return info
 
@@ -301,22 +898,31 @@ class ArtifactAPIClient(LoggingConfigurable):
         if not patch_url:
             raise ValueError("Malformed patch request")
 
-        res = requests.request(
+        res = self._request(
             url=patch_url,
             method=patch_method,
-            headers=patch_headers,
-            json={"patch": patch_list},
+            headers={"content-type": "application/json", **patch_headers},
+            data=json_dumps({"patch": patch_list}),
         )
         res.raise_for_status()
-        return res.json()
-
-    def upload(self, path: str, mime_type: str = "application/tar+gz") -> str:
+        clear_listing_cache()
+        return json_loads(res.content)
+
+    def upload(
+        self,
+        archive: "Union[str, BinaryIO]",
+        mime_type: str = "application/tar+gz",
+        filename: str = None,
+    ) -> str:
         """Upload an artifact archive file to storage.
 
         Args:
-            path (str): the full path to the archive file.
+            archive (str|BinaryIO): the full path to the archive file, or a
+                binary file object positioned at the start of the archive.
             mime_type (str): the MIME type of the archive file. Defaults to gzipped
                 tarball (application/tar+gz).
+            filename (str): the file name to report for the archive. Defaults to
+                the base name of the archive file.
 
         Returns:
             a URN pointing to the uploaded contents.
@@ -326,38 +932,78 @@ class ArtifactAPIClient(LoggingConfigurable):
             ValueError: if the prepared upload request is malformed.
             requests.exceptions.HTTPError: if the upload fails.
         """
+        with contextlib.ExitStack() as stack:
+            if isinstance(archive, str):
+                filename = filename or os.path.basename(archive)
+                archive = stack.enter_context(
+                    open(archive, "rb", buffering=UPLOAD_CHUNK_SIZE)
+                )
+            start = archive.tell()
+            size = archive.seek(0, os.SEEK_END) - start
+            archive.seek(start)
+
+            return self._upload(
+                ArchiveBody(archive, size), mime_type, filename, size=size
+            )
+
+    def upload_stream(
+        self,
+        chunks: "Iterable[bytes]",
+        mime_type: str = "application/tar+gz",
+        filename: str = "archive.tar.gz",
+    ) -> str:
+        """Upload an archive whose size is not known up front.
+
+        The body is sent with chunked transfer encoding, so the archive can
+        still be in the middle of being built (see
+        :meth:`ArtifactArchiver.stream`).
+
+        Args:
+            chunks (Iterable[bytes]): the archive contents.
+            mime_type (str): the MIME type of the archive.
+            filename (str): the file name to report for the archive.
+
+        Returns:
+            a URN pointing to the uploaded contents.
+
+        Raises:
+            ValueError: if the prepared upload request is malformed.
+            requests.exceptions.HTTPError: if the upload fails.
+        """
+        return self._upload(chunks, mime_type, filename)
+
+    def _upload(self, data, mime_type: str, filename: str, size: int = None) -> str:
         prepared_req = self.prepare_upload()
         upload_url = prepared_req.get("url")
         upload_method = prepared_req.get("method", "POST")
         upload_headers = prepared_req.get("headers", {})
-        upload_headers.update(
-            {
-                "content-type": mime_type,
-            }
-        )
 
         if not upload_url:
             raise ValueError("Malformed upload request")
 
-        stat = os.stat(path)
-        size_mb = stat.st_size / 1024 / 1024
-        self.log.info((f"Uploading {path} ({size_mb:.2f}MB) to {upload_url}"))
-
         upload_headers.update(
             {
                 "content-type": mime_type,
-                "content-disposition": f"attachment; filename={os.path.basename(path)}",
-                "content-length": str(stat.st_size),
+                "content-disposition": f"attachment; filename={filename}",
             }
         )
+        if size is not None:
+            upload_headers["content-length"] = str(size)
+            size_mb = size / 1024 / 1024
+            self.log.info(f"Uploading {filename} ({size_mb:.2f}MB) to {upload_url}")
+        else:
+            self.log.info(f"Streaming {filename} to {upload_url}")
+
+        res = self._request(
+            url=upload_url,
+            method=upload_method,
+            headers=upload_headers,
+            data=data,
+            read_timeout=self.upload_read_timeout,
+        )
+        res.raise_for_status()
 
-        with open(path, "rb") as f:
-            res = requests.request(
-                url=upload_url, method=upload_method, headers=upload_headers, data=f
-            )
-            res.raise_for_status()
-
-        info = res.json()
+        info = json_loads(res.content)
         self.log.info(f"Uploaded content: {info}")
 
         urn = info["contents"]["urn"]
@@ -373,14 +1019,68 @@ class ArtifactAPIClient(LoggingConfigurable):
         if not list_url:
             raise ValueError("Malformed ListArtifact request")
 
-        # TODO: support pagination / limit here, for users w/ lots of artifacts.
-        res = requests.request(url=list_url, method=list_method, headers=list_headers)
-        res.raise_for_status()
+        # The list url carries the Trovi token, so a listing is only reused
+        # for the same credentials. The cache holds the serialized listing
+        # because callers annotate the artifacts they are given.
+        cached = _cached_listing
+        if (
+            cached
+            and cached[0] == list_url
+            and time.monotonic() - cached[1] < self.list_cache_ttl
+        ):
+            return json_loads(cached[2])
+
+        artifacts = []
+        page_url, params = list_url, None
+        fetched = set()
+        while True:
+            res = self._request(
+                url=page_url, method=list_method, headers=list_headers, params=params
+            )
+            res.raise_for_status()
+            page = json_loads(res.content)
+            artifacts.extend(page.get("artifacts", []))
+            fetched.add((page_url, json_dumps(params)))
+
+            # If the listing is paginated, "next" is either the URL of the
+            # following page or the query parameters to fetch it with. Each
+            # cursor comes from the previous page, so pages can only be
+            # fetched in order.
+            next_page = page.get("next")
+            if not next_page:
+                break
+            if isinstance(next_page, str):
+                page_url, params = urljoin(page_url, next_page), None
+            elif isinstance(next_page, dict):
+                params = next_page
+            else:
+                raise ValueError(f"Unexpected next page in listing: {next_page!r}")
+            if (page_url, json_dumps(params)) in fetched:
+                break
 
-        artifacts = res.json().get("artifacts", [])
         self.log.info(f"Fetched {len(artifacts)} artifacts.")
+        if self.list_cache_ttl > 0:
+            _store_listing(list_url, artifacts)
         return artifacts
 
+    def _request(self, read_timeout: float = None, **kwargs):
+        """Send a request on the shared session, bounded by our timeouts.
+
+        If Trovi rejects the token in the URL, e.g. because it was revoked,
+        the cached token is dropped and the request is sent once more with a
+        new one. Requests with a streamed body cannot be sent again.
+        """
+        timeout = (self.connect_timeout, read_timeout or self.read_timeout)
+        res = http_session().request(timeout=timeout, **kwargs)
+        if res.status_code == 401 and isinstance(
+            kwargs.get("data"), (bytes, str, type(None))
+        ):
+            url = refresh_trovi_url(kwargs["url"])
+            if url:
+                kwargs["url"] = url
+                res = http_session().request(timeout=timeout, **kwargs)
+        return res
+
     def metric(self, uuid: str, slug: str, metric: str):
         call_jupyterhub_api(
             "trovi_metrics",
@@ -394,37 +1094,19 @@ class ArtifactAPIClient(LoggingConfigurable):
         )
 
     def _to_version_request(self, artifact: dict):
-        req = {}
-        if contents := artifact.get("newContents"):
-            req["contents"] = contents
-        if links := artifact.get("newLinks"):
-            req["links"] = links
-
-        return req
+        return {
+            name: artifact[field]
+            for field, name in VERSION_FIELDS
+            if artifact.get(field)
+        }
 
     def _to_create_request(self, artifact: dict):
         """Converts the front-end's representation of an artifact to a valid request"""
-        req = {}
-        if title := artifact.get("title"):
-            req["title"] = title
-        if short_desc := artifact.get("short_description"):
-            req["short_description"] = short_desc
-        if long_desc := artifact.get("long_description"):
-            req["long_description"] = long_desc
-        if tags := artifact.get("tags"):
-            req["tags"] = tags
-        if authors := artifact.get("authors"):
-            req["authors"] = authors
+        req = {field: artifact[field] for field in CREATE_FIELDS if artifact.get(field)}
         if projects := artifact.get("linked_projects"):
             if not all(type(p) is dict and "urn" in p for p in projects):
                 raise BadRequestError("Invalid linked projects")
             req["linked_projects"] = [p["urn"] for p in projects]
-        if repro := artifact.get("reproducibility"):
-            req["reproducibility"] = repro
-        if owner := artifact.get("owner_urn"):
-            req["owner_urn"] = owner
-        if vis := artifact.get("visibility"):
-            req["visibility"] = vis
 
         # Set the initial version as well
         if "newContents" in artifact or "newLinks" in artifact:
@@ -447,7 +1129,7 @@ class ArtifactLinkHandler(APIHandler, ErrorResponder):
     def post(self):
         self.check_xsrf_cookie()
         try:
-            body = json.loads(self.request.body.decode("utf-8"))
+            body = json_loads(self.request.body)
             path = body.pop("path")
             path = self._normalize_path(path)
             uuid = body.pop("uuid")
@@ -473,40 +1155,87 @@ class ArtifactLinkHandler(APIHandler, ErrorResponder):
 
 
 class ArtifactMetadataHandler(APIHandler, ErrorResponder):
-    LEGACY_ID_LINK_PREFIX = "urn:trovi:artifact:chameleon:legacy:"
+    LEGACY_ID_LINK_PREFIX = LEGACY_ID_LINK_PREFIX
 
     def initialize(self, db: DB = None, notebook_dir: str = None):
         self.api_client = ArtifactAPIClient(config=self.config)
         self.db = db
         self.notebook_dir = notebook_dir or "."
+        self._notebook_dir_abs = os.path.abspath(self.notebook_dir)
 
     def _normalize_path(self, path):
         if not path.startswith("/"):
             path = os.path.join(self.notebook_dir, path)
         return os.path.normpath(path)
 
+    def _is_within_notebook(self, path: str) -> bool:
+        """Whether a normalized path is the notebook directory or below it."""
+        path = os.path.abspath(path)
+        # Compare whole path components: a plain prefix check would accept
+        # e.g. /work2 for a notebook directory of /work.
+        return os.path.commonpath([path, self._notebook_dir_abs]) == (
+            self._notebook_dir_abs
+        )
+
     @web.authenticated
-    def post(self):
+    async def post(self):
         """Create a new artifact, or a new version of an existing artifact."""
 
         self.check_xsrf_cookie()
 
         try:
-            body = json.loads(self.request.body.decode("utf-8"))
+            body = json_loads(self.request.body)
 
             # 'path' is not part of the artifact metadata, but we will use it to
             # package and upload the artifact contents.
             path = body.pop("path", ".")
             path = self._normalize_path(path)
-            if not path.startswith(self.notebook_dir):
+            if not self._is_within_notebook(path):
                 raise IllegalArchiveError(
                     "Archive source must be in notebook directory"
                 )
 
-            archive = ArtifactArchiver(config=self.config).package(path)
-            contents_urn = self.api_client.upload(archive)
+            # Packaging and uploading can take minutes for large artifacts;
+            # keep all of it off the event loop so the server can keep
+            # handling other requests (e.g. heartbeats) in the meantime.
+            loop = IOLoop.current()
+            # Prepare the create request first: it does not need the contents,
+            # and an authentication failure should be reported before spending
+            # minutes packaging and uploading.
+            prepared_publish = await loop.run_in_executor(
+                None, self.api_client.prepare_publish, body
+            )
+            archiver = ArtifactArchiver(config=self.config)
+            filename = f"{os.path.basename(path)}{archiver.extension}"
+            if self.api_client.stream_uploads:
+                # Walking the tree can take a while; do it off the loop too.
+                chunks = await loop.run_in_executor(None, archiver.stream, path)
+                contents_urn = await loop.run_in_executor(
+                    None,
+                    functools.partial(
+                        self.api_client.upload_stream,
+                        chunks,
+                        mime_type=archiver.mime_type,
+                        filename=filename,
+                    ),
+                )
+            else:
+                archive = await loop.run_in_executor(None, archiver.package, path)
+                with archive:
+                    contents_urn = await loop.run_in_executor(
+                        None,
+                        functools.partial(
+                            self.api_client.upload,
+                            archive,
+                            mime_type=archiver.mime_type,
+                            filename=filename,
+                        ),
+                    )
             body["newContents"] = {"urn": contents_urn}
-            artifact = self.api_client.create(body)
+            artifact = await loop.run_in_executor(
+                None,
+                functools.partial(self.api_client.create, body, prepared_publish),
+            )
 
             # Set local properties
             artifact["path"] = path
@@ -550,12 +1279,12 @@ class ArtifactMetadataHandler(APIHandler, ErrorResponder):
             return self.error_response(500, str(err))
 
     @web.authenticated
-    def put(self):
+    async def put(self):
         """Edit metadata for an existing artifact."""
         self.check_xsrf_cookie()
 
         try:
-            body = json.loads(self.request.body.decode("utf-8"))
+            body = json_loads(self.request.body)
             uuid = body.pop("uuid")
             if not uuid:
                 return self.error_response(400, "Missing UUID for artifact")
@@ -564,7 +1293,9 @@ class ArtifactMetadataHandler(APIHandler, ErrorResponder):
             if not patches:
                 return self.error_response(400, "Missing patches for artifact")
 
-            artifact = self.api_client.patch(uuid, patches)
+            artifact = await IOLoop.current().run_in_executor(
+                None, self.api_client.patch, uuid, patches
+            )
             self.set_status(200)
             self.write(artifact)
             self.finish()
@@ -581,50 +1312,39 @@ class ArtifactMetadataHandler(APIHandler, ErrorResponder):
             return self.error_response(500, str(err))
 
     @web.authenticated
-    def get(self):
+    async def get(self):
         """List all artifacts visible to the user"""
         self.check_xsrf_cookie()
 
         try:
-            remote_artifacts = self.api_client.list()
-
             # The 'id' of local artifacts == a version UUID (or ID, for legacy versions.)
-            local_contents = {la.id: la.path for la in self.db.list_artifacts()}
-
-            # Find artifacts that map to local workspace
-            local_artifacts = []
-            for artifact in remote_artifacts:
-                for version in artifact["versions"]:
-                    search_keys = [version["contents"]["urn"]]
-                    # Handle legacy-linked artifacts
-                    search_keys.extend(
-                        [
-                            link["urn"].replace(self.LEGACY_ID_LINK_PREFIX, "")
-                            for link in version["links"]
-                            if link["urn"].startswith(self.LEGACY_ID_LINK_PREFIX)
-                        ]
-                    )
+            # Read before scanning the workspace: opening the database on first
+            # use may seed a .trovi.json file that the scan must find.
+            local_contents = self.db.artifact_paths()
+
+            # Fetch the remote listing while scanning the workspace for
+            # .trovi.json files, both off the event loop.
+            loop = IOLoop.current()
+            remote_artifacts, trovi_artifacts = await gen.multi(
+                [
+                    loop.run_in_executor(None, self.api_client.list),
+                    loop.run_in_executor(None, find_local_trovi_artifacts),
+                ]
+            )
 
-                    for key in search_keys:
-                        local_path = local_contents.get(key)
-                        if local_path:
-                            artifact["path"] = os.path.relpath(
-                                local_path, self.notebook_dir
-                            ).replace("./", "")
-                            artifact["ownership"] = "own"
-                            local_artifacts.append(artifact)
-                            break
-
-                # Find artifacts from .trovi.json files
-                for local_artifact in find_local_trovi_artifacts():
-                    if artifact["uuid"] == local_artifact["uuid"]:
-                        artifact["path"] = local_artifact["path"]
-                        # TODO we should check roles eventually
-                        artifact["ownership"] = "own"
-                        local_artifacts.append(artifact)
+            local_artifacts = match_local_artifacts(
+                remote_artifacts, local_contents, trovi_artifacts, self.notebook_dir
+            )
 
+            # The listing can be large; serialize it ourselves so orjson is
+            # used when it is installed.
             self.set_status(200)
-            self.write({"artifacts": local_artifacts, "remote_artifacts": remote_artifacts})
+            self.set_header("Content-Type", "application/json; charset=UTF-8")
+            self.write(
+                json_dumps(
+                    {"artifacts": local_artifacts, "remote_artifacts": remote_artifacts}
+                )
+            )
             return self.finish()
         except json.JSONDecodeError as err:
             return self.error_response(400, str(err))
@@ -647,31 +1367,35 @@ class ArtifactMetricHandler(APIHandler, ErrorResponder):
         self.notebook_dir = notebook_dir or "."
 
     @web.authenticated
-    def put(self):
+    async def put(self):
         """Edit metric for an existing artifact."""
         self.check_xsrf_cookie()
 
-        body = json.loads(self.request.body.decode("utf-8"))
+        body = json_loads(self.request.body)
 
         uuid = None
         version_slug = None
         try:
             artifact_path = body.pop("path", "")
             local_contents = {}
+            # Remove prefix `/home/$USER/work` if applicable, we want to
+            # normalize relative to `/work` (notebook_dir)
+            home_work_prefix = f"{os.getenv('HOME')}/work/"
             for la in self.db.list_artifacts():
                 p = la.path
-                # Remove prefix `/home/$USER/work` if applicable, we want to
-                # normalize relative to `/work` (notebook_dir)
-                user_home = os.getenv("HOME")
-                p = re.sub(re.escape(user_home) +'/work/', '', p)
-                # Strip out the `./`
-                p = p.replace("./", "")
-                p = os.path.relpath(p, self.notebook_dir)
+                if p.startswith(home_work_prefix):
+                    p = p[len(home_work_prefix) :]
+                p = os.path.relpath(
+                    os.path.join(self.notebook_dir, p), self.notebook_dir
+                )
                 local_contents[p] = (la.artifact_uuid, la.artifact_version_slug)
             if artifact_path in local_contents:
                 uuid = local_contents[artifact_path][0]
                 version_slug = local_contents[artifact_path][1]
-            for la in find_local_trovi_artifacts():
+            trovi_artifacts = await IOLoop.current().run_in_executor(
+                None, find_local_trovi_artifacts
+            )
+            for la in trovi_artifacts:
                 if artifact_path == la["path"]:
                     uuid = la["uuid"]
                     version_slug = la["version_slug"]
@@ -685,8 +1409,8 @@ class ArtifactMetricHandler(APIHandler, ErrorResponder):
                 if not metric_name:
                     return self.error_response(400, "Missing metric name")
 
-                self.api_client.metric(
-                    uuid, version_slug, metric_name
+                await IOLoop.current().run_in_executor(
+                    None, self.api_client.metric, uuid, version_slug, metric_name
                 )
             self.set_status(200)
             self.finish()
@@ -703,32 +1427,163 @@ class ArtifactMetricHandler(APIHandler, ErrorResponder):
             return self.error_response(500, str(err))
 
 
+def _store_listing(list_url: str, artifacts: list):
+    global _cached_listing
+    _cached_listing = (list_url, time.monotonic(), json_dumps(artifacts))
+
+
+def clear_listing_cache():
+    """Forget the cached artifact listing, e.g. after an artifact changed."""
+    global _cached_listing
+    _cached_listing = None
+
+
+def match_local_artifacts(
+    remote_artifacts: "list[dict]",
+    local_contents: "dict[str, str]",
+    trovi_artifacts: "list[dict]",
+    notebook_dir: str,
+) -> "list[dict]":
+    """Find the remote artifacts that are checked out in the workspace.
+
+    An artifact is local if one of its versions' contents (or, for legacy
+    versions, its legacy ID) is in ``local_contents``, or if a .trovi.json
+    file in the workspace names it. Matched artifacts are annotated with
+    their local ``path`` and ``ownership``.
+
+    Args:
+        remote_artifacts (list[dict]): the artifacts listed by Trovi.
+        local_contents (dict): local paths by contents ID, as returned by
+            :meth:`DB.artifact_paths`.
+        trovi_artifacts (list[dict]): as returned by
+            :func:`find_local_trovi_artifacts`.
+        notebook_dir (str): the directory local paths are made relative to.
+
+    Returns:
+        the matched artifacts, each listed once, in listing order.
+    """
+    # Paths of .trovi.json files by the artifact UUID they name.
+    trovi_paths = {
+        local_artifact.get("uuid"): local_artifact["path"]
+        for local_artifact in trovi_artifacts
+    }
+
+    # Index every version's contents URN, and legacy ID for legacy-linked
+    # artifacts, then match the index against the local contents in one pass.
+    prefix_len = len(LEGACY_ID_LINK_PREFIX)
+    lookup = {}
+    for artifact in remote_artifacts:
+        for version in artifact["versions"]:
+            lookup[version["contents"]["urn"]] = artifact
+            for link in version["links"]:
+                if link["urn"].startswith(LEGACY_ID_LINK_PREFIX):
+                    lookup[link["urn"][prefix_len:]] = artifact
+
+    # Find artifacts that map to local workspace
+    local_uuids = set()
+    for key in local_contents.keys() & lookup.keys():
+        artifact = lookup[key]
+        artifact["path"] = os.path.relpath(local_contents[key], notebook_dir)
+        artifact["ownership"] = "own"
+        local_uuids.add(artifact["uuid"])
+
+    # Find artifacts from .trovi.json files
+    by_uuid = {artifact["uuid"]: artifact for artifact in remote_artifacts}
+    for uuid in trovi_paths.keys() & by_uuid.keys():
+        artifact = by_uuid[uuid]
+        artifact["path"] = trovi_paths[uuid]
+        # TODO we should check roles eventually
+        artifact["ownership"] = "own"
+        local_uuids.add(uuid)
+
+    return [
+        artifact for artifact in remote_artifacts if artifact["uuid"] in local_uuids
+    ]
+
+
 def find_local_trovi_artifacts():
     """
     Returns a list of all artifacts from .trovi.json files
     """
     info = [
-        (str(p), (str(str(p.relative_to("/work").parent))))
-        for p in pathlib.Path('/work').glob('**/.trovi.json')
+        (config_path, os.path.relpath(os.path.dirname(config_path), "/work"))
+        for config_path in _find_trovi_configs("/work")
     ]
-    artifacts = []
-    for config_path, artifact_path in info:
+    if len(info) < 2:
+        configs = [_load_trovi_config(*i) for i in info]
+    else:
+        # Reading each small file is mostly open() latency, which on network
+        # storage is worth overlapping.
+        with ThreadPoolExecutor(max_workers=TROVI_CONFIG_READERS) as pool:
+            configs = list(pool.map(_load_trovi_config, *zip(*info)))
+
+    # Forget files that are gone.
+    for stale in _trovi_configs.keys() - {config_path for config_path, _ in info}:
+        _trovi_configs.pop(stale, None)
+
+    return [config for config in configs if config is not None]
+
+
+def _find_trovi_configs(root: str) -> "Iterator[str]":
+    """Yield the path of every .trovi.json file below ``root``.
+
+    A plain scandir walk, which avoids building a Path object for every
+    entry in the workspace. Symlinked directories are not followed.
+    """
+    pending = [root]
+    while pending:
         try:
-            with open(config_path) as f:
-                config = json.load(f)
-                config["path"] = artifact_path
-                artifacts.append(config)
-        except:
-            # For any issue loading the file, we just ignore it
-            LOG.warning("Could not load artifact from '%s'", config_path)
-    return artifacts
-
-def store_trovi_artifact_data(path: string, uuid: string, version: string):
+            it = os.scandir(pending.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.name == ".trovi.json":
+                    yield entry.path
+
+
+def _load_trovi_config(config_path: str, artifact_path: str):
+    try:
+        st = os.stat(config_path)
+        version = (st.st_mtime_ns, st.st_size)
+        # Only re-read files that changed since they were last loaded.
+        cached = _trovi_configs.get(config_path)
+        if cached and cached[0] == version:
+            return cached[1]
+        with open(config_path, "rb") as f:
+            config = json_loads(f.read())
+        config["path"] = artifact_path
+        _trovi_configs[config_path] = (version, config)
+        return config
+    except (OSError, ValueError, TypeError) as err:
+        # For any issue loading the file (unreadable, invalid JSON, or not a
+        # JSON object), we just ignore it
+        LOG.warning("Could not load artifact from '%s': %s", config_path, err)
+        return None
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def store_trovi_artifact_data(path: str, uuid: str, version: str):
     """
     Writes an artifact .trovi.json file
     """
-    with open(os.path.join(path, ".trovi.json"), "w") as f:
-        json.dump({
-            "uuid": uuid,
-            "version_slug": version,
-        }, f)
\ No newline at end of file
+    # Write to a temporary file and rename it into place, so that
+    # find_local_trovi_artifacts never reads a partially written file.
+    config_path = os.path.join(path, ".trovi.json")
+    tmp_path = f"{config_path}.{os.getpid()}.tmp"
+    data = {"uuid": uuid, "version_slug": version}
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(json_dumps(data))
+        os.replace(tmp_path, config_path)
+    except BaseException:
+        # Don't leave the partial file behind in the artifact directory.
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
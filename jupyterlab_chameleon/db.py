@@ -1,7 +1,10 @@
+from contextlib import contextmanager
 from dataclasses import astuple, dataclass, fields
 from importlib import resources
 import os
 import sqlite3
+import threading
+from typing import Callable, Iterable
 
 from .exception import ArtifactNotFoundError, DuplicateArtifactError
 
@@ -10,6 +13,21 @@ import logging
 LOG = logging.getLogger(__name__)
 
 DATABASE_NAME = "chameleon"
+# Stored in the database's user_version; bump when db_schema.sql changes so
+# existing databases pick up the new schema.
+SCHEMA_VERSION = 1
+
+# Applied to every new connection. WAL lets handlers read while another request
+# is writing, and with WAL, synchronous=NORMAL only fsyncs at checkpoints.
+# page_size only has an effect before the database file is first written.
+CONNECTION_PRAGMAS = (
+    "page_size=4096",
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "cache_size=-65536",
+    "busy_timeout=60000",
+)
 
 
 @dataclass
@@ -48,13 +66,33 @@ class DB:
         self._conn = None
 
     def build_schema(self):
+        conn = self.connect()
+        if conn.execute("pragma user_version").fetchone()[0] == SCHEMA_VERSION:
+            return
         with resources.open_text(__package__, "db_schema.sql") as f:
-            with self.connect() as conn:
-                conn.executescript(f.read())
+            schema = f.read()
+        try:
+            conn.executescript(
+                "begin immediate;\n"
+                f"{schema}\n"
+                f"pragma user_version = {SCHEMA_VERSION};\n"
+                "commit;"
+            )
+        except BaseException:
+            # executescript stops at the failing statement, which would leave
+            # the connection inside the write transaction.
+            if conn.in_transaction:
+                conn.rollback()
+            raise
 
     def reset(self):
+        # Servers seeded from ARTIFACT_CONTENTS_URN reset on every start; skip
+        # the write transaction entirely when there is nothing to delete.
         with self.connect() as conn:
-            cur = conn.cursor()
+            cur = conn.execute("select exists(select 1 from artifacts)")
+            if not cur.fetchone()[0]:
+                return
+        with self.transaction() as cur:
             cur.execute("delete from artifacts")
 
     def list_artifacts(self) -> "list[LocalArtifact]":
@@ -63,21 +101,32 @@ class DB:
             cur.execute(f'select {",".join(ARTIFACT_COLUMNS)} from artifacts')
             return [LocalArtifact(*row) for row in cur.fetchall()]
 
-    def insert_artifact(self, artifact: LocalArtifact):
+    def artifact_paths(self) -> "dict[str, str]":
+        """Map each artifact's contents ID to its local path.
+
+        Cheaper than :meth:`list_artifacts` when only those two columns are
+        needed, as no :class:`LocalArtifact` objects are built.
+        """
         with self.connect() as conn:
-            cur = conn.cursor()
-            cur.execute(
+            return dict(conn.execute("select id, path from artifacts"))
+
+    def insert_artifact(self, artifact: LocalArtifact):
+        self.insert_artifacts([artifact])
+
+    def insert_artifacts(self, artifacts: "Iterable[LocalArtifact]"):
+        """Insert several artifacts in a single transaction."""
+        with self.transaction() as cur:
+            cur.executemany(
                 (
                     f'insert into artifacts ({",".join(ARTIFACT_COLUMNS)}) '
-                    "values (?, ?, ?, ?, ?, ?)"
+                    f'values ({",".join("?" * len(ARTIFACT_COLUMNS))})'
                 ),
-                astuple(artifact),
+                (astuple(artifact) for artifact in artifacts),
             )
 
     def update_artifact(self, artifact: LocalArtifact):
         path = artifact.path
-        with self.connect() as conn:
-            cur = conn.cursor()
+        with self.transaction() as cur:
             cur.execute("select id from artifacts where path = ?", (path,))
             found = cur.fetchall()
             if len(found) > 1:
@@ -96,7 +145,49 @@ class DB:
                 astuple(artifact) + (path,),
             )
 
+    @contextmanager
+    def transaction(self):
+        """Run a unit of work in one ``begin immediate`` ... ``commit`` block.
+
+        The write lock is taken up front, so read-then-write sequences (like
+        :meth:`update_artifact`) cannot interleave with another writer.
+        """
+        conn = self.connect()
+        conn.execute("begin immediate")
+        try:
+            yield conn.cursor()
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+
     def connect(self) -> sqlite3.Connection:
         if not self._conn:
-            self._conn = sqlite3.connect(self.database)
+            conn = sqlite3.connect(self.database)
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(f"pragma {pragma}")
+            self._conn = conn
         return self._conn
+
+
+class LazyDB:
+    """A stand-in for :class:`DB` that defers opening it until first use.
+
+    Args:
+        factory (Callable): returns a ready-to-use :class:`DB`. It is called
+            at most once, on the first attribute access, e.g. to open the
+            database and build its schema.
+    """
+
+    def __init__(self, factory: "Callable[[], DB]"):
+        self._factory = factory
+        self._db = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if self._db is None:
+            with self._lock:
+                if self._db is None:
+                    self._db = self._factory()
+        return getattr(self._db, name)
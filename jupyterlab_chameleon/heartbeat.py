@@ -1,6 +1,9 @@
+from functools import partial
+
 from keystoneauth1.exceptions import Unauthorized
 from jupyter_server.base.handlers import APIHandler
 from tornado import web
+from tornado.ioloop import IOLoop
 
 from .exception import AuthenticationError, JupyterHubNotDetected
 from .util import ErrorResponder, jupyterhub_public_url, refresh_access_token
@@ -12,7 +15,9 @@ class HeartbeatHandler(APIHandler, ErrorResponder):
     @web.authenticated
     async def get(self):
         try:
-            _, expires_at = refresh_access_token(source_ident="heartbeat")
+            _, expires_at = await IOLoop.current().run_in_executor(
+                None, partial(refresh_access_token, source_ident="heartbeat")
+            )
             self.set_status(200)
             self.write({"expires_at": expires_at})
             await self.finish()
@@ -0,0 +1,373 @@
+import io
+import os
+import shutil
+import tarfile
+
+import pytest
+
+from . import artifact
+from .artifact import ArtifactAPIClient, ArtifactArchiver
+from .exception import BadRequestError, IllegalArchiveError
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200):
+        self.content = artifact.json_dumps(body)
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    """Answers requests with the given bodies in turn, repeating the last."""
+
+    def __init__(self, bodies):
+        self.bodies = bodies
+        self.requests = []
+
+    def request(self, **kwargs):
+        self.requests.append(kwargs)
+        body = self.bodies[min(len(self.requests), len(self.bodies)) - 1]
+        return body if isinstance(body, FakeResponse) else FakeResponse(body)
+
+
+@pytest.fixture
+def http_session(monkeypatch):
+    """Replace the shared HTTP session with a :class:`FakeSession`."""
+
+    def install(*bodies):
+        session = FakeSession(bodies)
+        monkeypatch.setattr(artifact, "http_session", lambda: session)
+        return session
+
+    return install
+
+
+class TestArtifactArchiver:
+    @pytest.fixture
+    def tree(self, tmpdir):
+        src = tmpdir.mkdir("src")
+        src.join("notebook.ipynb").write("{}")
+        src.mkdir("data").join("values.csv").write("a,b\n1,2\n")
+        src.mkdir(".git").join("HEAD").write("ref: refs/heads/main")
+        src.mkdir(".ipynb_checkpoints").join("notebook.ipynb").write("{}")
+        src.join(".trovi.json").write("{}")
+        src.join(".trovi.json.123.tmp").write("{")
+        return str(src)
+
+    def archive_members(self, archive):
+        with tarfile.open(fileobj=io.BytesIO(archive.read())) as tar:
+            return {m.name: m for m in tar.getmembers()}
+
+    def test_package(self, tree):
+        archiver = ArtifactArchiver(use_external_tools=False)
+        with archiver.package(tree) as archive:
+            members = self.archive_members(archive)
+        assert set(members) == {
+            "src",
+            "src/notebook.ipynb",
+            "src/data",
+            "src/data/values.csv",
+        }
+        assert members["src/data"].isdir()
+        assert members["src/data/values.csv"].size == len("a,b\n1,2\n")
+        assert not members["src/data/values.csv"].pax_headers
+
+    def test_package_ignore_glob(self, tree):
+        archiver = ArtifactArchiver(
+            use_external_tools=False, ignored_file_pattern=("*.csv",)
+        )
+        with archiver.package(tree) as archive:
+            members = self.archive_members(archive)
+        assert "src/data" in members
+        assert "src/data/values.csv" not in members
+        assert "src/.git/HEAD" in members
+
+    def test_package_nested_name(self, tree):
+        # Archive names must not be affected by the source path reappearing
+        # further down the tree.
+        os.makedirs(os.path.join(tree, "src", "src"))
+        archiver = ArtifactArchiver(use_external_tools=False)
+        with archiver.package(tree + os.sep) as archive:
+            members = self.archive_members(archive)
+        assert "src/src/src" in members
+
+    @pytest.mark.parametrize("use_external_tools", [False, True])
+    def test_package_symlinked_root(self, tree, tmpdir, use_external_tools):
+        if use_external_tools and not (shutil.which("tar") and shutil.which("pigz")):
+            pytest.skip("tar and pigz are required")
+        link = tmpdir.join("link")
+        link.mksymlinkto(tree)
+        archiver = ArtifactArchiver(use_external_tools=use_external_tools)
+        with archiver.package(str(link)) as archive:
+            members = self.archive_members(archive)
+        assert members["link"].isdir()
+        assert "link/data/values.csv" in members
+
+    def test_package_without_gnu_tar(self, tree, monkeypatch):
+        monkeypatch.setattr(artifact, "_has_gnu_tar", lambda: False)
+
+        def write_with_tar(*args):
+            raise AssertionError("tar should not be used")
+
+        monkeypatch.setattr(ArtifactArchiver, "_write_with_tar", write_with_tar)
+        archiver = ArtifactArchiver(use_external_tools=True)
+        with archiver.package(tree) as archive:
+            assert "src/data/values.csv" in self.archive_members(archive)
+
+    def test_has_gnu_tar(self, tmpdir, monkeypatch):
+        tar = tmpdir.join("tar")
+        tar.write("#!/bin/sh\necho 'bsdtar 3.6.2 - libarchive 3.6.2'\n")
+        tar.chmod(0o755)
+        monkeypatch.setenv("PATH", str(tmpdir))
+        artifact._has_gnu_tar.cache_clear()
+        try:
+            assert not artifact._has_gnu_tar()
+        finally:
+            artifact._has_gnu_tar.cache_clear()
+
+    def test_package_reproducible(self, tree):
+        archiver = ArtifactArchiver(use_external_tools=False, reproducible=True)
+        with archiver.package(tree) as archive:
+            first = archive.read()
+        os.utime(os.path.join(tree, "notebook.ipynb"), (0, 1234567890))
+        with archiver.package(tree) as archive:
+            second = archive.read()
+        assert first == second
+        names = [m.name for m in tarfile.open(fileobj=io.BytesIO(first))]
+        assert names == sorted(names)
+
+    def test_package_read_ahead(self, tree, monkeypatch):
+        monkeypatch.setattr(artifact, "ARCHIVE_READ_AHEAD_MIN_FILES", 1)
+        monkeypatch.setattr(artifact, "ARCHIVE_READ_AHEAD_DEPTH", 2)
+        archiver = ArtifactArchiver(use_external_tools=False)
+        with archiver.package(tree) as archive:
+            with tarfile.open(fileobj=io.BytesIO(archive.read())) as tar:
+                assert tar.getnames() == [
+                    "src",
+                    "src/data",
+                    "src/data/values.csv",
+                    "src/notebook.ipynb",
+                ]
+                values = tar.extractfile("src/data/values.csv").read()
+        assert values == b"a,b\n1,2\n"
+
+    def test_package_not_a_directory(self, tree):
+        with pytest.raises(ValueError):
+            ArtifactArchiver().package(os.path.join(tree, "notebook.ipynb"))
+
+    def test_package_too_large(self, tree):
+        with pytest.raises(IllegalArchiveError):
+            ArtifactArchiver(max_archive_size=4).package(tree)
+
+    def test_stream(self, tree):
+        archiver = ArtifactArchiver(use_external_tools=False)
+        archive = io.BytesIO(b"".join(archiver.stream(tree)))
+        assert "src/data/values.csv" in self.archive_members(archive)
+
+    @pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs procfs")
+    def test_stream_not_read(self, tree):
+        archiver = ArtifactArchiver(use_external_tools=False)
+        open_fds = len(os.listdir("/proc/self/fd"))
+        for _ in range(5):
+            archiver.stream(tree)
+        assert len(os.listdir("/proc/self/fd")) == open_fds
+
+
+class TestArtifactAPIClient:
+    def test_to_create_request(self):
+        req = ArtifactAPIClient()._to_create_request(
+            {
+                "title": "My artifact",
+                "short_description": "",
+                "tags": ["a"],
+                "linked_projects": [{"urn": "urn:project"}],
+                "newContents": {"urn": "urn:contents"},
+                "uuid": None,
+            }
+        )
+        assert req == {
+            "title": "My artifact",
+            "tags": ["a"],
+            "linked_projects": ["urn:project"],
+            "version": {"contents": {"urn": "urn:contents"}},
+        }
+
+    def test_to_create_request_invalid_projects(self):
+        with pytest.raises(BadRequestError):
+            ArtifactAPIClient()._to_create_request({"linked_projects": ["urn"]})
+
+    def test_list_cached(self, http_session):
+        session = http_session({"artifacts": [{"uuid": "a"}]})
+        artifact.clear_listing_cache()
+        client = ArtifactAPIClient(prepare_list=lambda: {"url": "https://trovi/"})
+
+        first = client.list()
+        first[0]["path"] = "annotated"
+        assert client.list() == [{"uuid": "a"}]
+        assert len(session.requests) == 1
+        assert session.requests[0]["timeout"] == (10.0, 300.0)
+
+        artifact.clear_listing_cache()
+        client.list()
+        assert len(session.requests) == 2
+
+    def test_list_paginated(self, http_session):
+        session = http_session(
+            {"artifacts": [{"uuid": "a"}], "next": {"after": "a"}},
+            {"artifacts": [{"uuid": "b"}], "next": {"after": "b"}},
+            # A server repeating its cursor must not loop forever.
+            {"artifacts": [{"uuid": "c"}], "next": {"after": "b"}},
+        )
+        client = ArtifactAPIClient(
+            prepare_list=lambda: {"url": "https://trovi/"}, list_cache_ttl=0
+        )
+
+        artifacts = client.list()
+        assert [a["uuid"] for a in artifacts] == ["a", "b", "c"]
+        assert [r["params"] for r in session.requests] == [
+            None,
+            {"after": "a"},
+            {"after": "b"},
+        ]
+
+    def test_list_paginated_by_url(self, http_session):
+        session = http_session(
+            {"artifacts": [{"uuid": "a"}], "next": "https://trovi/?cursor=b"},
+            {"artifacts": [{"uuid": "b"}], "next": "/?cursor=c"},
+            {"artifacts": [{"uuid": "c"}], "next": "https://trovi/?cursor=c"},
+        )
+        client = ArtifactAPIClient(
+            prepare_list=lambda: {"url": "https://trovi/"}, list_cache_ttl=0
+        )
+
+        artifacts = client.list()
+        assert [a["uuid"] for a in artifacts] == ["a", "b", "c"]
+        assert [(r["url"], r["params"]) for r in session.requests] == [
+            ("https://trovi/", None),
+            ("https://trovi/?cursor=b", None),
+            ("https://trovi/?cursor=c", None),
+        ]
+
+    def test_list_invalid_next(self, http_session):
+        http_session({"artifacts": [], "next": 2})
+        client = ArtifactAPIClient(
+            prepare_list=lambda: {"url": "https://trovi/"}, list_cache_ttl=0
+        )
+        with pytest.raises(ValueError):
+            client.list()
+
+    def test_request_refreshes_rejected_token(self, http_session, monkeypatch):
+        session = http_session(FakeResponse({}, status_code=401), {"uuid": "a"})
+        monkeypatch.setattr(
+            artifact,
+            "refresh_trovi_url",
+            lambda url: url.replace("access_token=old", "access_token=new"),
+        )
+        client = ArtifactAPIClient(
+            prepare_patch=lambda uuid: {"url": "https://trovi/a/?access_token=old"}
+        )
+
+        assert client.patch("a", []) == {"uuid": "a"}
+        assert [r["url"] for r in session.requests] == [
+            "https://trovi/a/?access_token=old",
+            "https://trovi/a/?access_token=new",
+        ]
+
+    def test_request_streamed_body_not_resent(self, http_session, monkeypatch):
+        session = http_session(FakeResponse({}, status_code=401))
+        monkeypatch.setattr(artifact, "refresh_trovi_url", lambda url: url)
+        client = ArtifactAPIClient()
+
+        res = client._request(method="PUT", url="https://trovi/", data=iter([b""]))
+        assert res.status_code == 401
+        assert len(session.requests) == 1
+
+    def test_patch(self, http_session):
+        session = http_session({"uuid": "a"})
+        client = ArtifactAPIClient(
+            prepare_patch=lambda uuid: {"url": f"https://trovi/{uuid}/"}
+        )
+
+        patch_list = [{"op": "replace", "path": "/title", "value": "New"}]
+        assert client.patch("a", patch_list) == {"uuid": "a"}
+        request = session.requests[0]
+        assert request["headers"]["content-type"] == "application/json"
+        assert artifact.json_loads(request["data"]) == {"patch": patch_list}
+
+
+def remote_artifact(uuid, contents, links=()):
+    return {
+        "uuid": uuid,
+        "versions": [
+            {"contents": {"urn": contents}, "links": [{"urn": u} for u in links]}
+        ],
+    }
+
+
+def test_match_local_artifacts():
+    legacy = artifact.LEGACY_ID_LINK_PREFIX
+    remote = [
+        remote_artifact("a", "urn:contents:a"),
+        remote_artifact("b", "urn:contents:b", links=[f"{legacy}123"]),
+        remote_artifact("c", "urn:contents:c"),
+        remote_artifact("d", "urn:contents:d"),
+    ]
+    local_contents = {
+        "urn:contents:a": "/work/a",
+        "123": "/work/b",
+        "urn:contents:x": "/work/x",
+    }
+    trovi_artifacts = [
+        {"uuid": "a", "path": "a-checkout"},
+        {"uuid": "c", "path": "c"},
+        {"uuid": "z", "path": "z"},
+    ]
+
+    local = artifact.match_local_artifacts(
+        remote, local_contents, trovi_artifacts, "/work"
+    )
+    # "a" matches both its contents and a .trovi.json, and is listed once.
+    assert [a["uuid"] for a in local] == ["a", "b", "c"]
+    # A .trovi.json takes precedence over the database.
+    assert local[0]["path"] == "a-checkout"
+    assert local[1]["path"] == "b"
+    assert local[2]["path"] == "c"
+    assert all(a["ownership"] == "own" for a in local)
+    assert "path" not in remote[3]
+
+
+def test_find_local_trovi_artifacts(tmpdir, monkeypatch):
+    good = tmpdir.mkdir("good").join(".trovi.json")
+    good.write('{"uuid": "a"}')
+    bad = tmpdir.mkdir("bad").join(".trovi.json")
+    bad.write("{not json")
+    config_paths = [str(good), str(bad)]
+    monkeypatch.setattr(artifact, "_find_trovi_configs", lambda root: config_paths)
+    monkeypatch.setattr(artifact, "_trovi_configs", {})
+
+    assert [c["uuid"] for c in artifact.find_local_trovi_artifacts()] == ["a"]
+    assert set(artifact._trovi_configs) == {str(good)}
+
+    # Rewriting a file invalidates its cached contents.
+    good.write('{"uuid": "b", "version_slug": "1"}')
+    assert [c["uuid"] for c in artifact.find_local_trovi_artifacts()] == ["b"]
+
+    # Files that are no longer found are forgotten.
+    config_paths.remove(str(good))
+    assert artifact.find_local_trovi_artifacts() == []
+    assert artifact._trovi_configs == {}
+
+
+def test_store_trovi_artifact_data(tmpdir):
+    artifact.store_trovi_artifact_data(str(tmpdir), "a", "1")
+    config = artifact.json_loads(tmpdir.join(".trovi.json").read_binary())
+    assert config == {"uuid": "a", "version_slug": "1"}
+    assert tmpdir.listdir() == [tmpdir.join(".trovi.json")]
+
+
+def test_store_trovi_artifact_data_failed(tmpdir):
+    with pytest.raises(TypeError):
+        artifact.store_trovi_artifact_data(str(tmpdir), object(), "1")
+    assert tmpdir.listdir() == []
@@ -1,21 +1,39 @@
 from dataclasses import asdict
+import io
 import os
+import sqlite3
 
 import pytest
 
-from .db import LocalArtifact, DB
+from . import db as db_module
+from .db import LocalArtifact, DB, LazyDB, SCHEMA_VERSION
 from .exception import ArtifactNotFoundError, DuplicateArtifactError
 
 
 class TestDB:
     no_id = LocalArtifact(
-        id=None, path="./foo", deposition_repo="repo", ownership="ownership"
+        id=None,
+        path="./foo",
+        deposition_repo="repo",
+        ownership="ownership",
+        artifact_uuid="uuid",
+        artifact_version_slug="slug",
     )
     with_id = LocalArtifact(
-        id="1", path="./foo", deposition_repo="repo", ownership="ownership"
+        id="1",
+        path="./foo",
+        deposition_repo="repo",
+        ownership="ownership",
+        artifact_uuid="uuid",
+        artifact_version_slug="slug",
     )
     duplicate = LocalArtifact(
-        id="2", path="./foo", deposition_repo="repo", ownership="ownership"
+        id="2",
+        path="./foo",
+        deposition_repo="repo",
+        ownership="ownership",
+        artifact_uuid="uuid",
+        artifact_version_slug="slug",
     )
 
     def init_db(self, database=DB.IN_MEMORY):
@@ -27,11 +45,54 @@ class TestDB:
         self.init_db(f"{tmpdir}/subfolder/mydb")
         assert os.path.exists(f"{tmpdir}/subfolder")
 
+    def test_wal_mode(self, tmpdir):
+        db = self.init_db(f"{tmpdir}/mydb")
+        cur = db.connect().execute("pragma journal_mode")
+        assert cur.fetchone()[0] == "wal"
+
+    def test_build_schema_once(self):
+        db = self.init_db()
+        db.insert_artifact(self.no_id)
+        db.build_schema()
+        cur = db.connect().execute("pragma user_version")
+        assert cur.fetchone()[0] == SCHEMA_VERSION
+        assert db.list_artifacts() == [self.no_id]
+
+    def test_build_schema_failed(self, monkeypatch):
+        db = DB(DB.IN_MEMORY)
+
+        class resources:
+            @staticmethod
+            def open_text(package, resource):
+                return io.StringIO("create table partial (x);\nnot a statement;")
+
+        monkeypatch.setattr(db_module, "resources", resources)
+        with pytest.raises(sqlite3.OperationalError):
+            db.build_schema()
+        conn = db.connect()
+        assert not conn.in_transaction
+        assert conn.execute("pragma user_version").fetchone()[0] == 0
+
+        monkeypatch.undo()
+        db.build_schema()
+        db.insert_artifact(self.no_id)
+        assert db.list_artifacts() == [self.no_id]
+
     def test_insert(self):
         db = self.init_db()
         db.insert_artifact(self.no_id)
         assert db.list_artifacts()[0] == self.no_id
 
+    def test_insert_many(self):
+        db = self.init_db()
+        db.insert_artifacts([self.no_id, self.with_id])
+        assert db.list_artifacts() == [self.no_id, self.with_id]
+
+    def test_artifact_paths(self):
+        db = self.init_db()
+        db.insert_artifacts([self.with_id])
+        assert db.artifact_paths() == {"1": "./foo"}
+
     def test_update_id(self):
         db = self.init_db()
         db.insert_artifact(self.no_id)
@@ -61,3 +122,25 @@ class TestDB:
         db.insert_artifact(self.no_id)
         db.reset()
         assert len(db.list_artifacts()) == 0
+
+    def test_reset_empty(self):
+        db = self.init_db()
+        db.reset()
+        assert db.list_artifacts() == []
+
+
+class TestLazyDB:
+    def test_opens_once_on_first_use(self):
+        opened = []
+
+        def factory():
+            db = DB(DB.IN_MEMORY)
+            db.build_schema()
+            opened.append(db)
+            return db
+
+        db = LazyDB(factory)
+        assert not opened
+        assert db.list_artifacts() == []
+        db.reset()
+        assert len(opened) == 1
@@ -0,0 +1,61 @@
+import types
+
+import pytest
+
+from . import trovi
+
+
+class TestGetTroviToken:
+    @pytest.fixture
+    def clock(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(
+            trovi, "time", types.SimpleNamespace(monotonic=lambda: now[0])
+        )
+        monkeypatch.setattr(trovi, "_cached_token", None)
+        return now
+
+    @pytest.fixture
+    def exchanges(self, monkeypatch):
+        tokens = []
+
+        def exchange():
+            tokens.append({"access_token": f"token-{len(tokens)}", "expires_in": 300})
+            return tokens[-1]
+
+        monkeypatch.setattr(trovi, "_exchange_trovi_token", exchange)
+        return tokens
+
+    def test_reused_until_expiry(self, clock, exchanges):
+        first = trovi.get_trovi_token()
+        clock[0] += 300 - trovi.TOKEN_EXPIRY_MARGIN - 1
+        assert trovi.get_trovi_token() is first
+        assert len(exchanges) == 1
+
+        clock[0] += 1
+        assert trovi.get_trovi_token()["access_token"] == "token-1"
+        assert len(exchanges) == 2
+
+    def test_not_cached_without_expiry(self, clock, monkeypatch):
+        monkeypatch.setattr(
+            trovi, "_exchange_trovi_token", lambda: {"access_token": "t"}
+        )
+        trovi.get_trovi_token()
+        assert trovi._cached_token is None
+
+    def test_invalidate(self, clock, exchanges):
+        first = trovi.get_trovi_token()
+        trovi.invalidate_trovi_token("some-other-token")
+        assert trovi.get_trovi_token() is first
+
+        trovi.invalidate_trovi_token(first["access_token"])
+        assert trovi.get_trovi_token()["access_token"] == "token-1"
+
+    def test_refresh_trovi_url(self, clock, exchanges):
+        token = trovi.get_trovi_token()["access_token"]
+        url = f"https://trovi/artifacts/?access_token={token}&after=a"
+        assert trovi.refresh_trovi_url(url) == (
+            "https://trovi/artifacts/?access_token=token-1&after=a"
+        )
+        assert trovi.refresh_trovi_url("https://trovi/artifacts/") is None
+        assert len(exchanges) == 2
@@ -0,0 +1,53 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from .util import http_session
+
+
+@pytest.fixture
+def unavailable_server():
+    """Serve 503 to every request, recording the methods it received."""
+    methods = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def _unavailable(self):
+            methods.append(self.command)
+            self.rfile.read(int(self.headers.get("content-length") or 0))
+            self.send_response(503)
+            self.send_header("content-length", "0")
+            self.end_headers()
+
+        do_GET = do_PUT = do_POST = _unavailable
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/", methods
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr("urllib3.util.retry.Retry.sleep", lambda *args: None)
+
+
+def test_http_session_retries_reads(unavailable_server):
+    url, methods = unavailable_server
+    assert http_session().request(method="GET", url=url).status_code == 503
+    assert methods == ["GET"] * 4
+
+
+@pytest.mark.parametrize("method", ["PUT", "POST"])
+def test_http_session_does_not_retry_writes(unavailable_server, method):
+    url, methods = unavailable_server
+    res = http_session().request(method=method, url=url, data=b"{}")
+    assert res.status_code == 503
+    assert methods == [method]
@@ -1,14 +1,22 @@
 import logging
 import os
 import requests
-from urllib.parse import urljoin
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
 
 from .exception import AuthenticationError
-from .util import refresh_access_token
+from .util import http_session, refresh_access_token
 
 LOG = logging.getLogger(__name__)
 
 TROVI_URL = os.getenv("TROVI_URL")
+# Cached tokens are refreshed this many seconds before they expire.
+TOKEN_EXPIRY_MARGIN = 30
+
+_token_lock = threading.Lock()
+# (token, monotonic time after which it must be refreshed)
+_cached_token = None
 
 
 def authenticate_trovi_url(url, trovi_token):
@@ -44,8 +52,58 @@ def artifact_versions_url(trovi_token, uuid, slug=None) -> str:
 def get_trovi_token():
     """
     Exchange the user's auth token for a trovi token.
+
+    The token is reused until shortly before it expires, so publishing an
+    artifact costs one exchange instead of one per Trovi request.
+    """
+    global _cached_token
+
+    with _token_lock:
+        if _cached_token and time.monotonic() < _cached_token[1]:
+            return _cached_token[0]
+        token = _exchange_trovi_token()
+        if expires_in := token.get("expires_in"):
+            _cached_token = (
+                token,
+                time.monotonic() + expires_in - TOKEN_EXPIRY_MARGIN,
+            )
+        return token
+
+
+def invalidate_trovi_token(access_token=None):
+    """Forget the cached Trovi token, e.g. because Trovi rejected it.
+
+    Args:
+        access_token (str): only forget the cached token if it is this one,
+            so a token another request has just refreshed is kept.
+    """
+    global _cached_token
+
+    with _token_lock:
+        if _cached_token and access_token in (None, _cached_token[0]["access_token"]):
+            _cached_token = None
+
+
+def refresh_trovi_url(url) -> "str | None":
+    """Re-authenticate a Trovi URL whose token was rejected.
+
+    Returns:
+        the URL with a newly exchanged token, or None if the URL does not
+        carry a Trovi token.
     """
-    trovi_resp = requests.post(
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    rejected = dict(query).get("access_token")
+    if rejected is None:
+        return None
+    invalidate_trovi_token(rejected)
+    token = get_trovi_token()["access_token"]
+    query = [(k, token if k == "access_token" else v) for k, v in query]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _exchange_trovi_token():
+    trovi_resp = http_session().post(
         urljoin(TROVI_URL, "/token/"),
         headers={"Content-Type": "application/json", "Accept": "application/json"},
         json={
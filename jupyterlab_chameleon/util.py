@@ -1,14 +1,66 @@
 from typing import Optional, Tuple, List
 
+import functools
+import json
 import os
 from urllib.parse import urlsplit, urlunsplit
 
 import requests
+from requests.adapters import HTTPAdapter
 import time
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from .exception import AuthenticationError, JupyterHubNotDetected
 
 ACCESS_TOKEN_ENDPOINT = 'tokens'
+# Requests that are safe to send again after a gateway error.
+RETRY_METHODS = frozenset({"GET", "HEAD"})
+
+
+def json_loads(data):
+    """Parse a JSON document from bytes or str, with orjson when installed.
+
+    Errors are always a json.JSONDecodeError (orjson's error subclasses it).
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj) -> bytes:
+    """Serialize an object to UTF-8 encoded JSON, with orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+
+@functools.lru_cache(maxsize=1)
+def http_session() -> requests.Session:
+    """Return the process-wide HTTP session.
+
+    Sharing one session keeps connections to the Hub and Trovi alive between
+    requests, instead of paying a TCP and TLS handshake on every call. Failed
+    connections, and reads answered with a gateway error, are retried a few
+    times. Writes are never replayed once sent: the backend may already have
+    applied them (e.g. counted a metric), and upload bodies cannot be rewound.
+    """
+    session = requests.Session()
+    retries = Retry(
+        total=3,
+        backoff_factor=0.2,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=RETRY_METHODS,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
 
 def call_jupyterhub_api(
@@ -28,7 +80,7 @@ def call_jupyterhub_api(
         path=(f'{hub_url_parsed.path}/{path.lstrip("/")}'),
     )
     url = urlunsplit(hub_url_replaced)
-    res = requests.request(
+    res = http_session().request(
         url=url,
         method=method,
         params=query,